@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import pickle
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import joblib
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIFFICULTY_DIR = os.path.join(ROOT_DIR, 'difficulty_and_time_prediction_model')
+WEATHER_DIR = os.path.join(ROOT_DIR, 'weather-prediction-model')
+RECOMMENDER_DIR = os.path.join(ROOT_DIR, 'recommender-system')
+GATEWAY_PATH = os.path.join(ROOT_DIR, 'planning-gateway', 'main.py')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SERVICE_DIRS = {'difficulty': DIFFICULTY_DIR, 'weather': WEATHER_DIR, 'recommender': RECOMMENDER_DIR}
+
+
+# synthetic payloads
+class PayloadFactory:
+    """
+    Builds realistic request payloads from the artifacts the services themselves load:
+    feature ranges from the difficulty scaler, kecamatan from the weather preprocessor and
+    locations/heights from the recommender catalog. Seeded, so every run sends the same requests.
+    """
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+        with open(os.path.join(DIFFICULTY_DIR, 'saved_model', 'feature_list.json'), 'r') as f:
+            self.feature_names = json.load(f)
+        scaler = joblib.load(os.path.join(DIFFICULTY_DIR, 'saved_model', 'minmax_scaler.pkl'))
+        self.feature_ranges = dict(zip(self.feature_names, zip(scaler.data_min_, scaler.data_max_)))
+
+        with open(os.path.join(WEATHER_DIR, 'weather_seasonal_preprocessor.pkl'), 'rb') as f:
+            preprocessor = pickle.load(f)
+        encoder = preprocessor.named_transformers_['cat']
+        self.kecamatan = [str(k) for k in encoder.categories_[0]]
+
+        gunung = joblib.load(os.path.join(RECOMMENDER_DIR, 'model', 'gunung_data.pkl'))
+        location_columns = [c for c in ('Provinsi', 'Kecamatan') if c in gunung.columns]
+        self.locations = sorted({str(v) for c in location_columns for v in gunung[c].dropna()})
+        self.heights = [int(h) for h in gunung['Ketinggian (dpl)'].dropna()]
+
+    def difficulty(self):
+        return {
+            feature.replace(' ', '_'): round(self.rng.uniform(low, high), 2)
+            for feature, (low, high) in self.feature_ranges.items()
+        }
+
+    def seasonality(self):
+        return {
+            'kecamatan_name': self.rng.choice(self.kecamatan),
+            'month': self.rng.randint(1, 12),
+            'year': self.rng.randint(2025, 2035),
+        }
+
+    def recommendation(self):
+        return {'lokasi': self.rng.choice(self.locations), 'ketinggian': self.rng.choice(self.heights)}
+
+    def plan(self, days=7):
+        mountain = self.difficulty()
+        start = np.datetime64('2026-01-01') + self.rng.randint(0, 364)
+        return {
+            'kecamatan': self.rng.choice(self.kecamatan),
+            'ketinggian': mountain['ketinggian'],
+            'jarak': mountain['jarak'],
+            'elevation_gain': mountain['elevation_gain'],
+            'lokasi': self.rng.choice(self.locations),
+            'days': [
+                {'datetime': str(start + i), **{k: v for k, v in self.difficulty().items()
+                                                if k in ('temp', 'precipprob', 'windspeed', 'humidity')}}
+                for i in range(days)
+            ],
+        }
+
+
+# scenario name -> (service, method, path, payload kind)
+SCENARIOS = {
+    'difficulty_predict': ('difficulty', 'POST', '/predict', 'difficulty'),
+    'weather_seasonality': ('weather', 'GET', '/forecast/seasonality', 'seasonality'),
+    'recommender_rekomendasi': ('recommender', 'POST', '/rekomendasi', 'recommendation'),
+    'gateway_plan': ('gateway', 'POST', '/plan', 'plan'),
+}
+
+
+def build_request(client, method, path, payload):
+    if method == 'GET':
+        return client.get(path, params=payload)
+    return client.post(path, json=payload)
+
+
+def current_rss_mb(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid):
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # the fields after the parenthesised command are "state ppid ..."
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def tree_memory_mb(pid):
+    """
+    Total RSS and PSS of a process and all its descendants. RSS counts the memory-mapped weights
+    once per worker that touched them, PSS splits shared pages between the processes mapping them.
+    """
+    rss = pss = 0.0
+    for child in process_tree(pid):
+        rss += current_rss_mb(child) or 0.0
+        try:
+            with open(f'/proc/{child}/smaps_rollup', 'r') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        pss += int(line.split()[1]) / 1024
+                        break
+        except OSError:
+            pass
+    return rss, pss
+
+
+async def drive(client, scenario, payloads, concurrency):
+    """
+    Sends every payload with at most `concurrency` requests in flight and returns the latencies of the
+    successful requests. Non-2xx responses and transport errors are counted as failures instead.
+    """
+    _, method, path, _ = SCENARIOS[scenario]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(payload):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await build_request(client, method, path, payload)
+            except httpx.HTTPError as e:
+                print(f"[FAIL] {scenario}: {type(e).__name__}: {e}")
+                failures += 1
+                return
+            # every payload is valid, so any non-2xx answer (including 4xx) is a failure
+            if not response.is_success:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in payloads))
+    wall = time.perf_counter() - start
+    return latencies, wall, failures
+
+
+def summarize(latencies, wall, failures, rss_mb):
+    # a scenario where every request failed has no latencies; report NaN rather than crash
+    ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        'requests': len(latencies) + failures,
+        'failures': failures,
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+    }
+
+
+def make_payloads(factory, scenario, n):
+    kind = SCENARIOS[scenario][3]
+    return [getattr(factory, kind)() for _ in range(n)]
+
+
+# in-process mode
+def load_gateway():
+    spec = importlib.util.spec_from_file_location('hiplan_gateway', GATEWAY_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_inprocess(scenarios, factory, args):
+    # the gateway loads all three services, so their apps are reused instead of importing them again
+    gateway = load_gateway()
+    apps = {'difficulty': gateway.difficulty.app, 'weather': gateway.weather.app,
+            'recommender': gateway.recommender.app, 'gateway': gateway.app}
+
+    results = {}
+    for scenario in scenarios:
+        app = apps[SCENARIOS[scenario][0]]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            await drive(client, scenario, make_payloads(factory, scenario, args.warmup), args.concurrency)
+            latencies, wall, failures = await drive(
+                client, scenario, make_payloads(factory, scenario, args.requests), args.concurrency)
+        results[f'inprocess/{scenario}'] = summarize(latencies, wall, failures, current_rss_mb())
+    return results
+
+
+# local uvicorn mode
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(service):
+    cwd = os.path.dirname(GATEWAY_PATH) if service == 'gateway' else SERVICE_DIRS[service]
+    port = free_port()
+    command = [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+               '--log-level', 'warning']
+    return wait_for_server(service, command, cwd, port)
+
+
+def start_serve(service, workers, shared_dir):
+    port = free_port()
+    command = [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+               '--shared-dir', shared_dir]
+    return wait_for_server(service, command, SERVICE_DIRS[service], port)
+
+
+def wait_for_server(service, command, cwd, port):
+    env = {k: v for k, v in os.environ.items() if k not in ('HIPLAN_SHARED_WEIGHTS', 'PROMETHEUS_MULTIPROC_DIR')}
+    process = subprocess.Popen(command, cwd=cwd, env=env)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for '{service}' exited with code {process.returncode}")
+        try:
+            httpx.get(f'{base_url}/', timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server for '{service}' did not start in time")
+
+
+async def run_uvicorn(scenarios, factory, args):
+    results = {}
+    for scenario in scenarios:
+        process, base_url = start_uvicorn(SCENARIOS[scenario][0])
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+                await drive(client, scenario, make_payloads(factory, scenario, args.warmup), args.concurrency)
+                latencies, wall, failures = await drive(
+                    client, scenario, make_payloads(factory, scenario, args.requests), args.concurrency)
+            results[f'uvicorn/{scenario}'] = summarize(latencies, wall, failures, current_rss_mb(process.pid))
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+# serve.py mode
+async def run_serve(scenarios, factory, args):
+    """
+    Runs each service through its serve.py with 1 and with --serve-workers workers and sends both the
+    same requests, to measure how throughput and total memory scale with the number of workers.
+    """
+    worker_counts = sorted({1, args.serve_workers})
+    shared_root = tempfile.mkdtemp(prefix='hiplan-bench-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    results = {}
+    try:
+        for scenario in scenarios:
+            service = SCENARIOS[scenario][0]
+            if service == 'gateway':
+                print(f"[SERVE] Skipping {scenario}: the gateway has no serve.py")
+                continue
+
+            # every worker gets its own warm-up share, so no worker answers its first request while measured
+            warmup = make_payloads(factory, scenario, args.warmup * max(worker_counts))
+            payloads = make_payloads(factory, scenario, args.requests)
+            for workers in worker_counts:
+                process, base_url = start_serve(service, workers, os.path.join(shared_root, service))
+                try:
+                    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+                        await drive(client, scenario, warmup[:args.warmup * workers], args.concurrency)
+                        latencies, wall, failures = await drive(client, scenario, payloads, args.concurrency)
+                    rss_mb, pss_mb = tree_memory_mb(process.pid)
+                    result = summarize(latencies, wall, failures, rss_mb)
+                    result.update(workers=workers, pss_mb=round(pss_mb, 1))
+                    results[f'serve/{scenario}/{workers}w'] = result
+                finally:
+                    process.terminate()
+                    process.wait()
+    finally:
+        shutil.rmtree(shared_root, ignore_errors=True)
+    return results
+
+
+def print_scaling(results):
+    """
+    Prints throughput and total memory of every serve.py run relative to the single-worker run.
+    """
+    serve = {name: r for name, r in results.items() if 'workers' in r}
+    if not serve:
+        return
+    header = f"{'scenario':<36}{'workers':>8}{'req/s':>10}{'speedup':>9}{'RSS MB':>10}{'PSS MB':>10}{'PSS x':>7}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for name, r in serve.items():
+        scenario = name.rsplit('/', 1)[0]
+        reference = serve[f'{scenario}/1w']
+        speedup = r['throughput_rps'] / reference['throughput_rps'] if reference['throughput_rps'] else float('nan')
+        growth = r['pss_mb'] / reference['pss_mb'] if reference['pss_mb'] else float('nan')
+        print(f"{scenario:<36}{r['workers']:>8}{r['throughput_rps']:>10.1f}{speedup:>9.2f}"
+              f"{r['rss_mb']:>10.1f}{r['pss_mb']:>10.1f}{growth:>7.2f}")
+
+
+# baseline comparison
+def compare(results, baseline, threshold):
+    """
+    Returns the regressions: scenarios with any failed request, and scenarios whose p50 or p95
+    latency grew, or whose throughput fell, by more than `threshold` relative to the baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        if current['failures']:
+            regressions.append(f"{name}: {current['failures']} of {current['requests']} requests failed")
+            continue
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if current[metric] > reference[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {reference[metric]} -> {current[metric]}")
+        if current['throughput_rps'] < reference['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{name}: throughput_rps {reference['throughput_rps']} -> {current['throughput_rps']}")
+    return regressions
+
+
+def print_table(results):
+    header = f"{'scenario':<36}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'RSS MB':>10}{'fail':>6}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        rss = f"{r['rss_mb']:.1f}" if r['rss_mb'] is not None else '-'
+        print(f"{name:<36}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['throughput_rps']:>10.1f}{rss:>10}{r['failures']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the HiPlan services.")
+    parser.add_argument('--mode', choices=['inprocess', 'uvicorn', 'both', 'serve'], default='both',
+                        help="'serve' compares serve.py with 1 and --serve-workers workers instead.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma separated scenario names.")
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--serve-workers', type=int, default=4, help="Worker count compared against 1 in serve mode.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative slowdown before the run fails.")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline.")
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help="Exit 0 when there is no baseline to compare against (by default that fails the run).")
+    parser.add_argument('--output', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # each mode gets a freshly seeded factory so both send exactly the same requests;
+    # uvicorn runs first so the servers are measured before this process loads the models itself
+    results = {}
+    if args.mode in ('uvicorn', 'both'):
+        results.update(asyncio.run(run_uvicorn(scenarios, PayloadFactory(args.seed), args)))
+    if args.mode in ('inprocess', 'both'):
+        results.update(asyncio.run(run_inprocess(scenarios, PayloadFactory(args.seed), args)))
+    if args.mode == 'serve':
+        results.update(asyncio.run(run_serve(scenarios, PayloadFactory(args.seed), args)))
+
+    print_table(results)
+    print_scaling(results)
+    print(f"\nPeak RSS of the benchmark process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = {name: r['failures'] for name, r in results.items() if r['failures']}
+    if args.update_baseline:
+        if failed:
+            print(f"Not writing a baseline from a run with failed requests: {failed}")
+            sys.exit(1)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        if not args.allow_missing_baseline:
+            sys.exit(1)
+        # failed requests still fail the run without a baseline
+        baseline = {}
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions (threshold {args.threshold:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    if baseline:
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+    else:
+        print("\nNo failed requests; latency and throughput were not compared.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Lightweight per-stage latency instrumentation.
+
+Handlers wrap their named stages in `METRICS.stage(...)`; the timings go into in-process
+Prometheus histograms exposed on `/metrics`, together with the model-load and warm-up times.
+When HIPLAN_PROFILING=1, a request sent with the `X-Profile: 1` header is sampled by a small
+stack-sampling profiler until its last body chunk is produced, and answered with the collapsed
+stacks instead of its normal body.
+
+Under serve.py every worker is its own process, so serve.py points PROMETHEUS_MULTIPROC_DIR at a
+shared directory: prometheus_client then writes the metric values there and `/metrics` merges the
+files of all workers, whichever worker answers the scrape.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import sys
+import threading
+import time
+
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_HEADER = "x-profile"
+PROFILING_ENABLED = os.environ.get("HIPLAN_PROFILING") == "1"
+MULTIPROCESS_ENABLED = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+_endpoint = ContextVar("hiplan_endpoint", default=None)
+_request_start = ContextVar("hiplan_request_start", default=None)
+_profiler = ContextVar("hiplan_profiler", default=None)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the watched threads at a fixed interval from a background thread.
+    Handlers run in the threadpool, so every thread that enters a stage is added to the watch list.
+    """
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self.thread_ids = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def watch(self):
+        self.thread_ids.add(threading.get_ident())
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def collapsed(self):
+        # one "frame;frame;frame count" line per stack, the input format of flamegraph tools
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class ServiceMetrics:
+    """
+    Histograms and startup gauges for one service, kept in the service's own registry.
+    """
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        self.stage_seconds = Histogram(
+            "hiplan_stage_duration_seconds", "Time spent in a named handler stage.",
+            ["endpoint", "stage"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.request_seconds = Histogram(
+            "hiplan_request_duration_seconds", "End-to-end request latency, including response serialization.",
+            ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        # with several workers the slowest worker's startup is reported
+        self.startup_seconds = Gauge(
+            "hiplan_startup_duration_seconds", "Time spent loading and warming up the model at startup.",
+            ["phase"], registry=self.registry, multiprocess_mode="max")
+
+    @contextmanager
+    def stage(self, name):
+        profiler = _profiler.get()
+        if profiler is not None:
+            profiler.watch()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            endpoint = _endpoint.get()
+            if endpoint is not None:
+                self.stage_seconds.labels(endpoint, name).observe(time.perf_counter() - start)
+
+    def parsed(self):
+        """
+        Called first thing in a handler: records the routing and request validation time.
+        """
+        profiler = _profiler.get()
+        if profiler is not None:
+            profiler.watch()
+        endpoint, start = _endpoint.get(), _request_start.get()
+        if endpoint is not None and start is not None:
+            self.stage_seconds.labels(endpoint, "request_parsing").observe(time.perf_counter() - start)
+
+    def record_startup(self, phase, seconds):
+        self.startup_seconds.labels(phase).set(seconds)
+        logger.info(f"Startup phase '{phase}' took {seconds:.3f}s")
+
+    def warm_up(self, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
+        self.record_startup("warmup", time.perf_counter() - start)
+
+    def install(self, app):
+        """
+        Adds the timing/profiling middleware and the /metrics route to a FastAPI app.
+        Call it after the CORS middleware is added, so profile responses keep the CORS headers.
+        """
+        app.add_middleware(InstrumentationMiddleware, metrics=self, router=app.router)
+
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            registry = self.registry
+            if MULTIPROCESS_ENABLED:
+                registry = CollectorRegistry()
+                multiprocess.MultiProcessCollector(registry)
+            return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+class InstrumentationMiddleware:
+    """
+    Plain ASGI middleware: times each request until its last body chunk has been sent, so
+    streamed responses are measured in full, and optionally profiles it over the same span.
+    """
+    def __init__(self, app, metrics, router):
+        self.app = app
+        self.metrics = metrics
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                endpoint = route.path
+                break
+
+        start = time.perf_counter()
+        _endpoint.set(endpoint)
+        _request_start.set(start)
+
+        profiler = None
+        headers = dict(scope["headers"])
+        if PROFILING_ENABLED and headers.get(PROFILE_HEADER.encode()) == b"1":
+            profiler = SamplingProfiler()
+            profiler.watch()
+            _profiler.set(profiler)
+            profiler.start()
+
+        response_start = {}
+        finished = False
+
+        def finish(status):
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            if profiler is not None:
+                profiler.stop()
+            if endpoint is not None:
+                self.metrics.request_seconds.labels(endpoint, scope["method"], str(status)).observe(
+                    time.perf_counter() - start)
+
+        async def instrumented_send(message):
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+                if profiler is None:
+                    await send(message)
+                return
+
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish(response_start.get("status", 500))
+                if profiler is not None:
+                    await send_profile()
+                    return
+
+            if profiler is None:
+                await send(message)
+
+        async def send_profile():
+            # keep the inner response's headers (e.g. CORS) but replace its body with the collapsed stacks
+            body = profiler.collapsed().encode()
+            kept = [(k, v) for k, v in response_start.get("headers", [])
+                    if k.lower() not in (b"content-type", b"content-length")]
+            await send({
+                "type": "http.response.start",
+                "status": response_start.get("status", 200),
+                "headers": kept + [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-samples", str(sum(profiler.samples.values())).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+        try:
+            await self.app(scope, receive, instrumented_send)
+        finally:
+            finish(response_start.get("status", 500))
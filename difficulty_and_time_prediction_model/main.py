@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+import numpy as np
 import pandas as pd
-import tensorflow as tf
 import joblib
 import os
 import logging
 import json
+import math
+import time
 from saved_model.utils import hours_to_hh_mm
+from instrumentation import ServiceMetrics
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +29,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage latency histograms, exposed on /metrics
+METRICS = ServiceMetrics()
+METRICS.install(app)
+
 # Load file paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "saved_model", "best_model.keras")
@@ -40,21 +48,39 @@ except Exception as e:
     logger.error(f"Failed to load feature list: {e}")
     raise RuntimeError("Failed to load feature list.")
 
-# Load scaler
-try:
-    scaler = joblib.load(SCALER_PATH)
-    logger.info("Scaler loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load scaler: {e}")
-    raise RuntimeError("Failed to load scaler.")
+# Attach to weights exported by serve.py when running with several workers
+load_start = time.perf_counter()
+SHARED_WEIGHTS_DIR = os.environ.get("HIPLAN_SHARED_WEIGHTS")
 
-# Load model
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    logger.info("Model loaded successfully.")
-except Exception as e:
-    logger.error(f"Failed to load model: {e}")
-    raise RuntimeError("Failed to load model.")
+if SHARED_WEIGHTS_DIR:
+    from shared_weights import load_shared
+
+    try:
+        scaler, model = load_shared(SHARED_WEIGHTS_DIR)
+        logger.info(f"Shared weights attached from {SHARED_WEIGHTS_DIR}")
+    except Exception as e:
+        logger.error(f"Failed to attach shared weights: {e}")
+        raise RuntimeError("Failed to attach shared weights.")
+else:
+    import tensorflow as tf
+
+    # Load scaler
+    try:
+        scaler = joblib.load(SCALER_PATH)
+        logger.info("Scaler loaded successfully")
+    except Exception as e:
+        logger.error(f"Failed to load scaler: {e}")
+        raise RuntimeError("Failed to load scaler.")
+
+    # Load model
+    try:
+        model = tf.keras.models.load_model(MODEL_PATH)
+        logger.info("Model loaded successfully.")
+    except Exception as e:
+        logger.error(f"Failed to load model: {e}")
+        raise RuntimeError("Failed to load model.")
+
+METRICS.record_startup("model_load", time.perf_counter() - load_start)
 
 # Request schema
 class InputData(BaseModel):
@@ -66,33 +92,156 @@ class InputData(BaseModel):
     windspeed: float
     humidity: float
 
+# Sweep settings: weather features varied on the grid, hard cap on grid size,
+# rows per model call, and the grid size above which results are streamed
+SWEEP_FEATURES = ["temp", "precipprob", "windspeed", "humidity"]
+MAX_SWEEP_GRID = 100_000
+SWEEP_CHUNK_SIZE = 4096
+SWEEP_STREAM_THRESHOLD = 10_000
+
+class SweepRange(BaseModel):
+    min: float
+    max: float
+    steps: int = Field(1, ge=1)  # 1 keeps the feature fixed at min
+
+class SweepData(BaseModel):
+    ketinggian: float
+    jarak: float
+    elevation_gain: float
+    temp: SweepRange
+    precipprob: SweepRange
+    windspeed: SweepRange
+    humidity: SweepRange
+
 # Routes
 @app.get("/")
 def home():
     return {"message": "Difficulty & Time Estimation API"}
 
+def predict_batch(items):
+    """
+    Scales and predicts a batch of InputData in a single model call.
+    """
+    # Prepare data in the correct order based on loaded feature list
+    with METRICS.stage("dataframe"):
+        rows = [[getattr(item, feature.replace(" ", "_")) for feature in FEATURE_NAMES] for item in items]
+        input_df = pd.DataFrame(rows, columns=FEATURE_NAMES)
+
+    # Scale input
+    with METRICS.stage("scaler_transform"):
+        scaled_input = scaler.transform(input_df)
+
+    # Predict
+    with METRICS.stage("model_predict"):
+        prediction = model.predict(scaled_input)
+    if prediction.shape[1] != 2:
+        raise ValueError("Model must output two values: difficulty and estimated time.")
+
+    with METRICS.stage("serialize"):
+        return [
+            {
+                "estimated_time": hours_to_hh_mm(pred_time),
+                "difficulty_score": round(float(pred_difficulty), 2)
+            }
+            for pred_difficulty, pred_time in prediction
+        ]
+
 @app.post("/predict")
 def predict(data: InputData):
+    METRICS.parsed()
     try:
-        # Prepare data in the correct order based on loaded feature list
-        input_features = [getattr(data, feature.replace(" ", "_")) for feature in FEATURE_NAMES]
-        input_df = pd.DataFrame([input_features], columns=FEATURE_NAMES)
+        return predict_batch([data])[0]
 
-        # Scale input
-        scaled_input = scaler.transform(input_df)
+    except Exception as e:
+        logger.exception("Prediction error")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-        # Predict
-        prediction = model.predict(scaled_input)
+def sweep_chunks(data, axes):
+    """
+    Evaluates the weather grid in chunks of SWEEP_CHUNK_SIZE rows, yielding (offset, prediction).
+    Grid points are generated per chunk from their flat index, so the full grid is never materialized.
+    """
+    shape = tuple(len(axes[feature]) for feature in SWEEP_FEATURES)
+    total = math.prod(shape)
+    fixed = {"ketinggian": data.ketinggian, "jarak": data.jarak, "elevation_gain": data.elevation_gain}
+
+    for offset in range(0, total, SWEEP_CHUNK_SIZE):
+        with METRICS.stage("grid"):
+            index = np.arange(offset, min(offset + SWEEP_CHUNK_SIZE, total))
+            coords = np.unravel_index(index, shape)
+            columns = {feature: axes[feature][c] for feature, c in zip(SWEEP_FEATURES, coords)}
+            columns.update({feature: np.full(len(index), value) for feature, value in fixed.items()})
+            input_df = pd.DataFrame({feature: columns[feature.replace(" ", "_")] for feature in FEATURE_NAMES})
+
+        with METRICS.stage("scaler_transform"):
+            scaled_input = scaler.transform(input_df)
+
+        with METRICS.stage("model_predict"):
+            prediction = model.predict(scaled_input, batch_size=len(index), verbose=0)
         if prediction.shape[1] != 2:
             raise ValueError("Model must output two values: difficulty and estimated time.")
 
-        pred_difficulty, pred_time = prediction[0]
+        yield offset, prediction
+
+def sweep_values(prediction):
+    return {
+        "difficulty_score": np.round(prediction[:, 0].astype(float), 2).tolist(),
+        "estimated_time_hours": np.round(prediction[:, 1].astype(float), 2).tolist()
+    }
 
-        return {
-            "estimated_time": hours_to_hh_mm(pred_time),
-            "difficulty_score": round(float(pred_difficulty), 2)
-        }
+@app.post("/predict/sweep")
+def predict_sweep(data: SweepData):
+    METRICS.parsed()
+
+    # JSON NaN/Infinity parse as floats; reject them before they reach linspace or the model
+    for feature in ("ketinggian", "jarak", "elevation_gain"):
+        if not math.isfinite(getattr(data, feature)):
+            raise HTTPException(status_code=400, detail=f"'{feature}' must be a finite number.")
+
+    ranges = {feature: getattr(data, feature) for feature in SWEEP_FEATURES}
+    for feature, sweep_range in ranges.items():
+        if not (math.isfinite(sweep_range.min) and math.isfinite(sweep_range.max)):
+            raise HTTPException(status_code=400, detail=f"'{feature}' min and max must be finite numbers.")
+        if sweep_range.max < sweep_range.min:
+            raise HTTPException(status_code=400, detail=f"'{feature}' max must not be smaller than min.")
+
+    # check the cap before building any axis
+    shape = [sweep_range.steps for sweep_range in ranges.values()]
+    grid_size = math.prod(shape)
+    if grid_size > MAX_SWEEP_GRID:
+        raise HTTPException(status_code=400, detail=f"Sweep grid has {grid_size} points, the maximum is {MAX_SWEEP_GRID}.")
+
+    axes = {feature: np.linspace(r.min, r.max, r.steps) for feature, r in ranges.items()}
+
+    # values are flattened in row-major order over `axes`, i.e. index [temp, precipprob, windspeed, humidity]
+    header = {
+        "axes": {feature: np.round(axes[feature], 4).tolist() for feature in SWEEP_FEATURES},
+        "shape": shape
+    }
+
+    if grid_size > SWEEP_STREAM_THRESHOLD:
+        # NDJSON: the header line, then one line per evaluated chunk
+        def stream():
+            yield json.dumps(header) + "\n"
+            try:
+                for offset, prediction in sweep_chunks(data, axes):
+                    with METRICS.stage("serialize"):
+                        line = json.dumps({"offset": offset, **sweep_values(prediction)}) + "\n"
+                    yield line
+            except Exception:
+                logger.exception("Sweep error")
+                yield json.dumps({"error": "Sweep failed."}) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    try:
+        prediction = np.concatenate([chunk for _, chunk in sweep_chunks(data, axes)])
+        with METRICS.stage("serialize"):
+            return {**header, **sweep_values(prediction)}
 
     except Exception as e:
-        logger.exception("Prediction error")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        logger.exception("Sweep error")
+        raise HTTPException(status_code=500, detail=f"Sweep failed: {str(e)}")
+
+# Warm up the model so the first request does not pay for graph tracing
+METRICS.warm_up(lambda: predict_batch([InputData(**{feature.replace(" ", "_"): 0.0 for feature in FEATURE_NAMES})]))
@@ -0,0 +1,63 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+from shared_weights import export_shared, is_current
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "saved_model", "best_model.keras")
+SCALER_PATH = os.path.join(BASE_DIR, "saved_model", "minmax_scaler.pkl")
+
+# /dev/shm is RAM backed, so the exported weights live in shared memory rather than on disk
+DEFAULT_SHARED_DIR = (
+    "/dev/shm/hiplan-difficulty" if os.path.isdir("/dev/shm")
+    else os.path.join(BASE_DIR, "shared_weights_export")
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the difficulty API from several workers sharing one copy of the weights.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--shared-dir", default=os.environ.get("HIPLAN_SHARED_WEIGHTS", DEFAULT_SHARED_DIR))
+    args = parser.parse_args()
+
+    # Export in a short-lived child so the parent never keeps TensorFlow in memory
+    if not is_current(args.shared_dir, [MODEL_PATH, SCALER_PATH]):
+        logger.info(f"Exporting shared weights to {args.shared_dir}")
+        exporter = multiprocessing.get_context("spawn").Process(
+            target=export_shared, args=(args.shared_dir, MODEL_PATH, SCALER_PATH)
+        )
+        exporter.start()
+        exporter.join()
+        if exporter.exitcode != 0:
+            raise RuntimeError("Failed to export shared weights.")
+
+    # Workers inherit the environment: attach to the export and keep one BLAS thread per worker
+    os.environ["HIPLAN_SHARED_WEIGHTS"] = args.shared_dir
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+
+    # One metrics directory per run: every worker writes its values there and /metrics merges them
+    metrics_dir = tempfile.mkdtemp(prefix="hiplan-difficulty-metrics-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    logger.info(f"Starting {args.workers} workers on {args.host}:{args.port}")
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Shared, memory-mapped model weights for multi-worker serving.
+
+serve.py exports the Keras weights and the MinMaxScaler tables once into plain .npy files
+(on /dev/shm when available). Every worker maps those files read-only, so the pages are shared
+between processes and the workers never have to import TensorFlow.
+"""
+from contextlib import contextmanager
+import fcntl
+import glob
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+
+# rows and tolerances of the parity check between the export and the Keras/sklearn pipeline
+PARITY_ROWS = 256
+PARITY_RTOL = 1e-4
+PARITY_ATOL = 1e-3
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+}
+
+
+def source_stamp(paths):
+    return {os.path.basename(p): [os.path.getsize(p), os.path.getmtime(p)] for p in paths}
+
+
+def is_current(export_dir, sources):
+    manifest_path = os.path.join(export_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    return manifest.get("sources") == source_stamp(sources)
+
+
+@contextmanager
+def export_lock(export_dir):
+    """
+    Serializes exports to the same export_dir between processes, e.g. two serve.py starting together.
+    """
+    export_dir = os.path.abspath(export_dir)
+    os.makedirs(os.path.dirname(export_dir), exist_ok=True)
+    with open(f"{export_dir}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_version_dir(export_dir):
+    # a fresh directory next to export_dir; exports are never rewritten in place, since workers may
+    # still have the previous files memory-mapped and would see them truncated
+    export_dir = os.path.abspath(export_dir)
+    return tempfile.mkdtemp(prefix=f"{os.path.basename(export_dir)}.", dir=os.path.dirname(export_dir))
+
+
+def publish(export_dir, version_dir):
+    """
+    Atomically points export_dir, a symlink, at a complete version_dir. Older versions are removed,
+    except the one just replaced: workers of a running server may still be attaching to it, and
+    files that are already mapped stay valid after they are unlinked.
+    """
+    export_dir = os.path.abspath(export_dir)
+    previous = os.path.realpath(export_dir) if os.path.exists(export_dir) else None
+    if os.path.isdir(export_dir) and not os.path.islink(export_dir):
+        # a directory written in place by an older serve.py: keep it as the previous version
+        previous = new_version_dir(export_dir)
+        os.rename(export_dir, previous)
+
+    link = f"{version_dir}.link"
+    os.symlink(version_dir, link)
+    os.replace(link, export_dir)
+
+    for path in glob.glob(f"{glob.escape(export_dir)}.*"):
+        if path not in (version_dir, previous) and os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_shared(export_dir, model_path, scaler_path):
+    """
+    Loads the Keras model and the scaler and publishes their parameters at export_dir.
+    The export is written to a new directory and checked there, then made visible through an
+    atomic symlink swap, so workers only ever attach to a complete export that is never rewritten.
+    """
+    with export_lock(export_dir):
+        if is_current(export_dir, [model_path, scaler_path]):
+            # a concurrent serve.py finished the same export while this one waited for the lock
+            return
+        version_dir = new_version_dir(export_dir)
+        try:
+            write_export(version_dir, model_path, scaler_path)
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        publish(export_dir, version_dir)
+
+
+def write_export(version_dir, model_path, scaler_path):
+    """
+    Writes the parameters to the empty version_dir and checks them against the Keras model.
+    """
+    import joblib
+    import pandas as pd
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    scaler = joblib.load(scaler_path)
+
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ("InputLayer", "Dropout"):
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Unsupported layer for shared serving: {kind}")
+
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation for shared serving: {activation}")
+
+        kernel, bias = layer.get_weights()
+        index = len(layers)
+        np.save(os.path.join(version_dir, f"dense_{index}_kernel.npy"), kernel.astype(np.float32))
+        np.save(os.path.join(version_dir, f"dense_{index}_bias.npy"), bias.astype(np.float32))
+        layers.append({"activation": activation})
+
+    np.save(os.path.join(version_dir, "scaler_scale.npy"), scaler.scale_.astype(np.float32))
+    np.save(os.path.join(version_dir, "scaler_min.npy"), scaler.min_.astype(np.float32))
+
+    manifest = {
+        "layers": layers,
+        "scaler": {"clip": bool(getattr(scaler, "clip", False)), "feature_range": list(scaler.feature_range)},
+        "sources": source_stamp([model_path, scaler_path]),
+    }
+    with open(os.path.join(version_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+    # random rows within the fitted feature ranges, with the column names the scaler was fitted on
+    rng = np.random.default_rng(0)
+    columns = getattr(scaler, "feature_names_in_", None)
+    sample = pd.DataFrame(rng.uniform(scaler.data_min_, scaler.data_max_, size=(PARITY_ROWS, len(scaler.data_min_))),
+                          columns=columns)
+    expected = model.predict(scaler.transform(sample), verbose=0)
+    check_parity(version_dir, sample, expected)
+
+
+def check_parity(export_dir, sample, expected):
+    """
+    Compares predictions of the export against the reference pipeline and raises if they differ.
+    """
+    shared_scaler, shared_model = load_shared(export_dir)
+    actual = shared_model.predict(shared_scaler.transform(sample))
+    if not np.allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL):
+        max_diff = float(np.max(np.abs(actual - expected)))
+        raise ValueError(f"Shared weights do not match the Keras model (max abs difference {max_diff:.6f}).")
+
+
+class SharedDenseModel:
+    """
+    Numpy forward pass over memory-mapped Dense weights, exposing the same predict() as the Keras model.
+    """
+    def __init__(self, weights):
+        self.weights = weights
+
+    def predict(self, inputs, batch_size=None, verbose=None):
+        # batch_size and verbose are accepted for compatibility with the Keras signature
+        x = np.asarray(inputs, dtype=np.float32)
+        for kernel, bias, activation in self.weights:
+            x = ACTIVATIONS[activation](x @ kernel + bias)
+        return x
+
+
+class SharedMinMaxScaler:
+    """
+    Applies a fitted MinMaxScaler from its exported scale_ and min_ tables.
+    """
+    def __init__(self, scale, min_, clip, feature_range):
+        self.scale_ = scale
+        self.min_ = min_
+        self.clip = clip
+        self.feature_range = feature_range
+
+    def transform(self, X):
+        scaled = np.asarray(X, dtype=np.float32) * self.scale_ + self.min_
+        if self.clip:
+            scaled = np.clip(scaled, *self.feature_range)
+        return scaled
+
+
+def load_shared(export_dir):
+    """
+    Attaches to an export made by export_shared and returns (scaler, model).
+    """
+    # resolve the symlink once, so every file is read from the same export even if a new one is published
+    export_dir = os.path.realpath(export_dir)
+    with open(os.path.join(export_dir, MANIFEST_NAME), "r") as f:
+        manifest = json.load(f)
+
+    def attach(name):
+        return np.load(os.path.join(export_dir, name), mmap_mode="r")
+
+    weights = [
+        (attach(f"dense_{i}_kernel.npy"), attach(f"dense_{i}_bias.npy"), layer["activation"])
+        for i, layer in enumerate(manifest["layers"])
+    ]
+    scaler = SharedMinMaxScaler(
+        attach("scaler_scale.npy"),
+        attach("scaler_min.npy"),
+        manifest["scaler"]["clip"],
+        manifest["scaler"]["feature_range"],
+    )
+    return scaler, SharedDenseModel(weights)
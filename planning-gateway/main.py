@@ -0,0 +1,158 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import List, Optional
+import importlib.util
+import asyncio
+import logging
+import os
+import sys
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIRS = {
+    "weather": "weather-prediction-model",
+    "difficulty": "difficulty_and_time_prediction_model",
+    "recommender": "recommender-system",
+}
+
+# All three models run in this single process, so serve.py's shared-weights mode does not apply here
+os.environ.pop("HIPLAN_SHARED_WEIGHTS", None)
+# The three services share metric names, so their multiprocess metric files would be merged together
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+
+# Helper modules every service imports under the same plain name from its own folder
+SERVICE_LOCAL_MODULES = ("instrumentation", "saved_model", "shared_weights")
+
+
+def forget_service_local_modules():
+    for module_name in list(sys.modules):
+        if module_name.split(".")[0] in SERVICE_LOCAL_MODULES:
+            del sys.modules[module_name]
+
+
+def load_service(name):
+    """
+    Imports a service's main.py under a unique module name. Each service resolves its artifacts
+    relative to its own folder, so its directory is made the working directory and put on sys.path
+    while it loads. Its helper modules are dropped from sys.modules before and after, so every
+    service imports its own copies instead of reusing the previous service's.
+    """
+    service_dir = os.path.join(ROOT_DIR, SERVICE_DIRS[name])
+    previous_cwd = os.getcwd()
+    forget_service_local_modules()
+    sys.path.insert(0, service_dir)
+    os.chdir(service_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(f"hiplan_{name}", os.path.join(service_dir, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(previous_cwd)
+        sys.path.remove(service_dir)
+        forget_service_local_modules()
+    logger.info(f"Service '{name}' loaded from {service_dir}")
+    return module
+
+
+weather = load_service("weather")
+difficulty = load_service("difficulty")
+recommender = load_service("recommender")
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="HiPlan Planning Gateway",
+    description="Serves the seasonality, difficulty and recommender APIs from one process, plus a composite /plan endpoint.",
+    version="1.0.0"
+)
+
+# Enable CORS for frontend access
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["*"],
+)
+
+# Same range as the weather service's days_to_predict; every day is one row of the batched difficulty call
+MAX_PLAN_DAYS = 90
+
+# Request schema
+class DailyWeather(BaseModel):
+    datetime: date
+    temp: float
+    precipprob: float
+    windspeed: float
+    humidity: float
+
+class PlanRequest(BaseModel):
+    kecamatan: str
+    ketinggian: float
+    jarak: float
+    elevation_gain: float
+    days: List[DailyWeather] = Field(..., min_length=1, max_length=MAX_PLAN_DAYS)
+    lokasi: Optional[str] = None  # location used for recommendations, defaults to the kecamatan
+
+
+def plan_difficulty(data: PlanRequest):
+    # one batched model call for every day of the plan
+    items = [
+        difficulty.InputData(
+            ketinggian=data.ketinggian,
+            jarak=data.jarak,
+            elevation_gain=data.elevation_gain,
+            temp=day.temp,
+            precipprob=day.precipprob,
+            windspeed=day.windspeed,
+            humidity=day.humidity,
+        )
+        for day in data.days
+    ]
+    try:
+        predictions = difficulty.predict_batch(items)
+    except Exception as e:
+        logger.exception("Prediction error")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    return [{"date": day.datetime.isoformat(), **prediction} for day, prediction in zip(data.days, predictions)]
+
+
+def plan_recommendations(data: PlanRequest):
+    rekom_input = recommender.InputData(lokasi=data.lokasi or data.kecamatan, ketinggian=int(round(data.ketinggian)))
+    return recommender.rekomendasi_post(rekom_input)
+
+
+# Mount the existing APIs under their own prefixes
+app.mount("/weather", weather.app)
+app.mount("/difficulty", difficulty.app)
+app.mount("/recommender", recommender.app)
+
+# Routes
+@app.get("/")
+def home():
+    return {"message": "HiPlan Planning Gateway", "services": ["/weather", "/difficulty", "/recommender", "/plan"]}
+
+@app.post("/plan")
+async def plan(data: PlanRequest):
+    # seasonality is judged on the month of the first planned day
+    start = data.days[0].datetime
+
+    # the three sub-computations run concurrently in the threadpool, without going through HTTP
+    seasonality, daily, recommendations = await asyncio.gather(
+        run_in_threadpool(weather.get_seasonality_forecast, data.kecamatan, start.month, start.year),
+        run_in_threadpool(plan_difficulty, data),
+        run_in_threadpool(plan_recommendations, data),
+    )
+
+    return {
+        "seasonality": seasonality,
+        "daily": daily,
+        "recommendations": recommendations,
+    }
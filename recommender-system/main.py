@@ -5,18 +5,29 @@ from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 import scipy
 import os
+import time
 import pandas as pd
+from instrumentation import ServiceMetrics
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, 'model')
 
+# Matriks fitur dibaca dari export serve.py (memory-mapped) saat berjalan dengan beberapa worker
+SHARED_WEIGHTS_DIR = os.environ.get('HIPLAN_SHARED_WEIGHTS')
+
+load_start = time.perf_counter()
 try:
     vectorizer = joblib.load(os.path.join(MODEL_DIR, 'vectorizer.pkl'))
     scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
-    combined_recom_features = joblib.load(os.path.join(MODEL_DIR, 'combined_features.pkl'))
+    if SHARED_WEIGHTS_DIR:
+        from shared_weights import load_shared
+        combined_recom_features = load_shared(SHARED_WEIGHTS_DIR)
+    else:
+        combined_recom_features = joblib.load(os.path.join(MODEL_DIR, 'combined_features.pkl'))
     gunung = joblib.load(os.path.join(MODEL_DIR, 'gunung_data.pkl'))
 except Exception as e:
     raise RuntimeError(f"Gagal load model/data: {e}")
+load_seconds = time.perf_counter() - load_start
 
 app = FastAPI(title="API Rekomendasi Gunung")
 
@@ -29,6 +40,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Histogram latensi per tahap, tersedia di /metrics
+METRICS = ServiceMetrics()
+METRICS.install(app)
+METRICS.record_startup("model_load", load_seconds)
+
 @app.get("/")
 def read_root():
     return {
@@ -53,18 +69,22 @@ def rekomendasikan_gunung(input_lokasi, input_ketinggian, top_n=5, similarity_th
 
     try:
         # Proses rekomendasi
-        input_lokasi_vec = vectorizer.transform([input_lokasi])
-        input_numerik_df = pd.DataFrame([[input_ketinggian]], columns=['Ketinggian (dpl)'])
-        input_numerik = scaler.transform(input_numerik_df)
-        input_combined = scipy.sparse.hstack([input_lokasi_vec, input_numerik])
+        with METRICS.stage("vectorizer_transform"):
+            input_lokasi_vec = vectorizer.transform([input_lokasi])
+        with METRICS.stage("scaler_transform"):
+            input_numerik_df = pd.DataFrame([[input_ketinggian]], columns=['Ketinggian (dpl)'])
+            input_numerik = scaler.transform(input_numerik_df)
+            input_combined = scipy.sparse.hstack([input_lokasi_vec, input_numerik])
 
-        similarity_scores = cosine_similarity(input_combined, combined_recom_features).flatten()
+        with METRICS.stage("cosine_similarity"):
+            similarity_scores = cosine_similarity(input_combined, combined_recom_features).flatten()
 
-        filter_akses = gunung['Akses'] == 'Buka'
-        qualified_indices = [
-            i for i, score in enumerate(similarity_scores)
-            if score >= similarity_threshold and filter_akses[i]
-        ]
+        with METRICS.stage("filter"):
+            filter_akses = gunung['Akses'] == 'Buka'
+            qualified_indices = [
+                i for i, score in enumerate(similarity_scores)
+                if score >= similarity_threshold and filter_akses[i]
+            ]
 
     except Exception as e:
             raise HTTPException(status_code=500, detail=f"Terjadi error internal: {str(e)}")
@@ -83,9 +103,14 @@ def rekomendasikan_gunung(input_lokasi, input_ketinggian, top_n=5, similarity_th
 # Endpoint
 @app.post("/rekomendasi")
 def rekomendasi_post(data: InputData):
+    METRICS.parsed()
     hasil = rekomendasikan_gunung(data.lokasi, data.ketinggian, top_n=5)
     if hasil is None or hasil.empty:
         return {"message": "⚠ Tidak ada gunung yang cocok ditemukan."}
     
-    hasil = hasil.astype(object)
-    return {"rekomendasi": hasil.to_dict(orient="records")}
\ No newline at end of file
+    with METRICS.stage("serialize"):
+        hasil = hasil.astype(object)
+        return {"rekomendasi": hasil.to_dict(orient="records")}
+
+# Warm-up agar request pertama tidak menanggung biaya inisialisasi
+METRICS.warm_up(lambda: rekomendasikan_gunung("jawa barat", 3000))
@@ -0,0 +1,50 @@
+import argparse
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+from shared_weights import export_shared, is_current
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMBINED_FEATURES_PATH = os.path.join(BASE_DIR, 'model', 'combined_features.pkl')
+
+# /dev/shm berbasis RAM, jadi matriks fitur yang diexport berada di shared memory
+DEFAULT_SHARED_DIR = (
+    '/dev/shm/hiplan-recommender' if os.path.isdir('/dev/shm')
+    else os.path.join(BASE_DIR, 'shared_weights_export')
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jalankan API rekomendasi dengan beberapa worker yang berbagi satu salinan matriks fitur.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 2)))
+    parser.add_argument('--shared-dir', default=os.environ.get('HIPLAN_SHARED_WEIGHTS', DEFAULT_SHARED_DIR))
+    args = parser.parse_args()
+
+    if not is_current(args.shared_dir, [COMBINED_FEATURES_PATH]):
+        print(f"Export matriks fitur ke {args.shared_dir}")
+        export_shared(args.shared_dir, COMBINED_FEATURES_PATH)
+
+    # Worker mewarisi environment: attach ke export dan pakai satu thread BLAS per worker
+    os.environ['HIPLAN_SHARED_WEIGHTS'] = args.shared_dir
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+
+    # Satu direktori metrics per run: tiap worker menulis nilainya di sini dan /metrics menggabungkannya
+    metrics_dir = tempfile.mkdtemp(prefix='hiplan-recommender-metrics-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+
+    print(f"Menjalankan {args.workers} worker di {args.host}:{args.port}")
+    try:
+        uvicorn.run('main:app', host=args.host, port=args.port, workers=args.workers)
+    finally:
+        os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
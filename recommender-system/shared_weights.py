@@ -0,0 +1,137 @@
+"""
+Shared, memory-mapped recommender catalog for multi-worker serving.
+
+serve.py exports the combined mountain feature matrix once as plain CSR arrays (on /dev/shm
+when available). Every worker maps those arrays read-only, so the catalog pages are shared
+between processes instead of being unpickled into every worker.
+"""
+from contextlib import contextmanager
+import fcntl
+import glob
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import scipy
+
+MANIFEST_NAME = "manifest.json"
+
+
+def source_stamp(paths):
+    return {os.path.basename(p): [os.path.getsize(p), os.path.getmtime(p)] for p in paths}
+
+
+def is_current(export_dir, sources):
+    manifest_path = os.path.join(export_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    return manifest.get("sources") == source_stamp(sources)
+
+
+@contextmanager
+def export_lock(export_dir):
+    """
+    Serializes exports to the same export_dir between processes, e.g. two serve.py starting together.
+    """
+    export_dir = os.path.abspath(export_dir)
+    os.makedirs(os.path.dirname(export_dir), exist_ok=True)
+    with open(f"{export_dir}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_version_dir(export_dir):
+    # a fresh directory next to export_dir; exports are never rewritten in place, since workers may
+    # still have the previous files memory-mapped and would see them truncated
+    export_dir = os.path.abspath(export_dir)
+    return tempfile.mkdtemp(prefix=f"{os.path.basename(export_dir)}.", dir=os.path.dirname(export_dir))
+
+
+def publish(export_dir, version_dir):
+    """
+    Atomically points export_dir, a symlink, at a complete version_dir. Older versions are removed,
+    except the one just replaced: workers of a running server may still be attaching to it, and
+    files that are already mapped stay valid after they are unlinked.
+    """
+    export_dir = os.path.abspath(export_dir)
+    previous = os.path.realpath(export_dir) if os.path.exists(export_dir) else None
+    if os.path.isdir(export_dir) and not os.path.islink(export_dir):
+        # a directory written in place by an older serve.py: keep it as the previous version
+        previous = new_version_dir(export_dir)
+        os.rename(export_dir, previous)
+
+    link = f"{version_dir}.link"
+    os.symlink(version_dir, link)
+    os.replace(link, export_dir)
+
+    for path in glob.glob(f"{glob.escape(export_dir)}.*"):
+        if path not in (version_dir, previous) and os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_shared(export_dir, combined_features_path):
+    """
+    Publishes the combined feature matrix at export_dir as CSR arrays.
+    The export is written to a new directory and checked there, then made visible through an
+    atomic symlink swap, so workers only ever attach to a complete export that is never rewritten.
+    """
+    with export_lock(export_dir):
+        if is_current(export_dir, [combined_features_path]):
+            # a concurrent serve.py finished the same export while this one waited for the lock
+            return
+        version_dir = new_version_dir(export_dir)
+        try:
+            write_export(version_dir, combined_features_path)
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        publish(export_dir, version_dir)
+
+
+def write_export(version_dir, combined_features_path):
+    """
+    Writes the CSR arrays to the empty version_dir and checks the mapped matrix against the original.
+    """
+    features = scipy.sparse.csr_matrix(joblib.load(combined_features_path))
+    features.sort_indices()
+
+    np.save(os.path.join(version_dir, "features_data.npy"), features.data)
+    np.save(os.path.join(version_dir, "features_indices.npy"), features.indices)
+    np.save(os.path.join(version_dir, "features_indptr.npy"), features.indptr)
+
+    manifest = {
+        "shape": list(features.shape),
+        "sources": source_stamp([combined_features_path]),
+    }
+    with open(os.path.join(version_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+    if (load_shared(version_dir) != features).nnz:
+        raise ValueError("Shared feature matrix does not match combined_features.pkl.")
+
+
+def load_shared(export_dir):
+    """
+    Attaches to an export made by export_shared and returns the combined feature matrix.
+    """
+    # resolve the symlink once, so every file is read from the same export even if a new one is published
+    export_dir = os.path.realpath(export_dir)
+    with open(os.path.join(export_dir, MANIFEST_NAME), "r") as f:
+        manifest = json.load(f)
+
+    def attach(name):
+        return np.load(os.path.join(export_dir, name), mmap_mode="r")
+
+    return scipy.sparse.csr_matrix(
+        (attach("features_data.npy"), attach("features_indices.npy"), attach("features_indptr.npy")),
+        shape=tuple(manifest["shape"]),
+        copy=False,
+    )
@@ -1,29 +1,45 @@
 import pandas as pd
 import numpy as np
-import tensorflow as tf
 import pickle
+import os
+import time
 import calendar
 from datetime import timedelta
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
+from instrumentation import ServiceMetrics
 
-# load model and preprocessor
-try:
-    SEASONAL_MODEL_PATH = 'weather_seasonal_model.keras'
-    SEASONAL_PREPROCESSOR_PATH = 'weather_seasonal_preprocessor.pkl'
-    
-    MODEL = tf.keras.models.load_model(SEASONAL_MODEL_PATH)
-    with open(SEASONAL_PREPROCESSOR_PATH, 'rb') as f:
-        PREPROCESSOR = pickle.load(f)
-    print("Model and preprocessor loaded successfully.")
+# attach to weights exported by serve.py when running with several workers
+load_start = time.perf_counter()
+SHARED_WEIGHTS_DIR = os.environ.get('HIPLAN_SHARED_WEIGHTS')
 
-except FileNotFoundError as e:
-    print(f" ERROR: Could not load model or preprocessor file.")
-    print(f"Make sure '{SEASONAL_MODEL_PATH}' and '{SEASONAL_PREPROCESSOR_PATH}' are in the same directory as main.py.")
-    print(f"Details: {e}")
-    exit()
+if SHARED_WEIGHTS_DIR:
+    from shared_weights import load_shared
 
+    PREPROCESSOR, MODEL = load_shared(SHARED_WEIGHTS_DIR)
+    print(f"Shared model and preprocessor attached from '{SHARED_WEIGHTS_DIR}'.")
+
+else:
+    import tensorflow as tf
+
+    # load model and preprocessor
+    try:
+        SEASONAL_MODEL_PATH = 'weather_seasonal_model.keras'
+        SEASONAL_PREPROCESSOR_PATH = 'weather_seasonal_preprocessor.pkl'
+
+        MODEL = tf.keras.models.load_model(SEASONAL_MODEL_PATH)
+        with open(SEASONAL_PREPROCESSOR_PATH, 'rb') as f:
+            PREPROCESSOR = pickle.load(f)
+        print("Model and preprocessor loaded successfully.")
+
+    except FileNotFoundError as e:
+        print(f" ERROR: Could not load model or preprocessor file.")
+        print(f"Make sure '{SEASONAL_MODEL_PATH}' and '{SEASONAL_PREPROCESSOR_PATH}' are in the same directory as main.py.")
+        print(f"Details: {e}")
+        exit()
+
+load_seconds = time.perf_counter() - load_start
 
 # init fastapi app
 app = FastAPI(
@@ -41,6 +57,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# per-stage latency histograms, exposed on /metrics
+METRICS = ServiceMetrics()
+METRICS.install(app)
+METRICS.record_startup("model_load", load_seconds)
+
 # date range prediction
 def generate_seasonal_forecast(kecamatan_name: str, start_date_str: str, days_to_predict: int):
     """
@@ -51,39 +72,43 @@ def generate_seasonal_forecast(kecamatan_name: str, start_date_str: str, days_to
     except ValueError:
         return {"error": "Invalid date format. Please use 'YYYY-MM-DD'."}
 
-    features_list = []
-    date_range = [start_date + timedelta(days=i) for i in range(days_to_predict)]
-
-    for date in date_range:
-        features_list.append({
-            'year': date.year,
-            'day_sin': np.sin(2 * np.pi * date.dayofyear / 366),
-            'day_cos': np.cos(2 * np.pi * date.dayofyear / 366),
-            'month_sin': np.sin(2 * np.pi * date.month / 12),
-            'month_cos': np.cos(2 * np.pi * date.month / 12),
-            'kecamatan': kecamatan_name
-        })
-    
-    input_df = pd.DataFrame(features_list)
+    with METRICS.stage("dataframe"):
+        features_list = []
+        date_range = [start_date + timedelta(days=i) for i in range(days_to_predict)]
+
+        for date in date_range:
+            features_list.append({
+                'year': date.year,
+                'day_sin': np.sin(2 * np.pi * date.dayofyear / 366),
+                'day_cos': np.cos(2 * np.pi * date.dayofyear / 366),
+                'month_sin': np.sin(2 * np.pi * date.month / 12),
+                'month_cos': np.cos(2 * np.pi * date.month / 12),
+                'kecamatan': kecamatan_name
+            })
+
+        input_df = pd.DataFrame(features_list)
 
     try:
-        input_processed = PREPROCESSOR.transform(input_df)
+        with METRICS.stage("preprocessor_transform"):
+            input_processed = PREPROCESSOR.transform(input_df)
     except Exception:
         return {"error": f"Could not process input. It's possible the location '{kecamatan_name}' was not in the training data."}
 
-    all_predicted_values = MODEL.predict(input_processed)
+    with METRICS.stage("model_predict"):
+        all_predicted_values = MODEL.predict(input_processed)
 
     # format output
-    final_results = []
-    targets = ['precipprob', 'windspeed', 'temp', 'humidity']
-    
-    for i, date in enumerate(date_range):
-        result = {'date': date.strftime('%Y-%m-%d'), 'kecamatan': kecamatan_name}
-        predicted_values_for_day = all_predicted_values[i]
-        for target, value in zip(targets, predicted_values_for_day):
-            result[f"predicted_{target}"] = round(float(value), 2)
-        final_results.append(result)
-        
+    with METRICS.stage("serialize"):
+        final_results = []
+        targets = ['precipprob', 'windspeed', 'temp', 'humidity']
+
+        for i, date in enumerate(date_range):
+            result = {'date': date.strftime('%Y-%m-%d'), 'kecamatan': kecamatan_name}
+            predicted_values_for_day = all_predicted_values[i]
+            for target, value in zip(targets, predicted_values_for_day):
+                result[f"predicted_{target}"] = round(float(value), 2)
+            final_results.append(result)
+
     return final_results
 
 
@@ -92,34 +117,39 @@ def generate_seasonal_forecast(kecamatan_name: str, start_date_str: str, days_to
 
 # monthly prediction
 def generate_monthly_average(kecamatan_name: str, month: int, year: int):
-    num_days = calendar.monthrange(year, month)[1]
-    date_range = pd.to_datetime([f"{year}-{month:02d}-{day:02d}" for day in range(1, num_days + 1)])
-
-    features_list = []
-    for date in date_range:
-        features_list.append({
-            'year': date.year,
-            'day_sin': np.sin(2 * np.pi * date.dayofyear / 366),
-            'day_cos': np.cos(2 * np.pi * date.dayofyear / 366),
-            'month_sin': np.sin(2 * np.pi * date.month / 12),
-            'month_cos': np.cos(2 * np.pi * date.month / 12),
-            'kecamatan': kecamatan_name
-        })
-    input_df = pd.DataFrame(features_list)
+    with METRICS.stage("dataframe"):
+        num_days = calendar.monthrange(year, month)[1]
+        date_range = pd.to_datetime([f"{year}-{month:02d}-{day:02d}" for day in range(1, num_days + 1)])
+
+        features_list = []
+        for date in date_range:
+            features_list.append({
+                'year': date.year,
+                'day_sin': np.sin(2 * np.pi * date.dayofyear / 366),
+                'day_cos': np.cos(2 * np.pi * date.dayofyear / 366),
+                'month_sin': np.sin(2 * np.pi * date.month / 12),
+                'month_cos': np.cos(2 * np.pi * date.month / 12),
+                'kecamatan': kecamatan_name
+            })
+        input_df = pd.DataFrame(features_list)
 
     try:
-        input_processed = PREPROCESSOR.transform(input_df)
+        with METRICS.stage("preprocessor_transform"):
+            input_processed = PREPROCESSOR.transform(input_df)
     except Exception:
         return {"error": f"Could not process input for '{kecamatan_name}'."}
 
-    all_predicted_values = MODEL.predict(input_processed)
-    average_values = np.mean(all_predicted_values, axis=0)
-    
-    targets = ['precipprob', 'windspeed', 'temp', 'humidity']
+    with METRICS.stage("model_predict"):
+        all_predicted_values = MODEL.predict(input_processed)
 
-    result = {}
-    for target, value in zip(targets, average_values):
-        result[f"average_{target}"] = round(float(value), 2)
+    with METRICS.stage("serialize"):
+        average_values = np.mean(all_predicted_values, axis=0)
+
+        targets = ['precipprob', 'windspeed', 'temp', 'humidity']
+
+        result = {}
+        for target, value in zip(targets, average_values):
+            result[f"average_{target}"] = round(float(value), 2)
 
     return result
 
@@ -145,6 +175,7 @@ def get_status():
 
 @app.get("/forecast/seasonality")
 def get_seasonality_forecast(kecamatan_name: str, month: int, year: int):
+    METRICS.parsed()
 
     if not 1 <= month <= 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12.")
@@ -168,4 +199,8 @@ def get_seasonality_forecast(kecamatan_name: str, month: int, year: int):
             "determined_seasonality": seasonality,
             "reasoning_metrics": monthly_avg
         }
-    }
\ No newline at end of file
+    }
+
+
+# warm up the model so the first request does not pay for graph tracing
+METRICS.warm_up(lambda: generate_monthly_average('warmup', 1, 2025))
@@ -0,0 +1,244 @@
+import argparse
+import pickle
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+from tensorflow.keras.layers import Dense, Dropout, Input
+from tensorflow.keras.models import Model
+
+SEASONAL_MODEL_PATH = 'weather_seasonal_model.keras'
+SEASONAL_PREPROCESSOR_PATH = 'weather_seasonal_preprocessor.pkl'
+
+numerical_features = ['year', 'day_sin', 'day_cos', 'month_sin', 'month_cos']
+categorical_features = ['kecamatan']
+features = numerical_features + categorical_features
+targets = ['precipprob', 'windspeed', 'temp', 'humidity']
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class EpochTimer(Callback):
+    """
+    Records wall-clock time and peak RSS at the end of every epoch.
+    """
+    def on_train_begin(self, logs=None):
+        self.epoch_times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        self.epoch_times.append(elapsed)
+        print(f"[EPOCH {epoch + 1}] {elapsed:.2f}s, peak RSS {peak_rss_mb():.1f} MB")
+
+
+# load cleaned data
+def load_weather_data(csv_path, chunksize):
+    """
+    Reads the cleaned weather csv in chunks and keeps only the columns the model needs, so the
+    raw file never has to fit in memory at once. The resulting slim frame (11 narrow columns)
+    is held in memory for the train/test split and for fitting the preprocessor.
+    """
+    chunks = []
+    for chunk in pd.read_csv(csv_path, usecols=['datetime', 'kecamatan'] + targets, chunksize=chunksize):
+        chunk = chunk.dropna().drop_duplicates()
+        dt = pd.to_datetime(chunk['datetime'])
+        chunks.append(pd.DataFrame({
+            'year': dt.dt.year.astype('int16'),
+            'day_sin': np.sin(2 * np.pi * dt.dt.dayofyear / 366).astype('float32'),
+            'day_cos': np.cos(2 * np.pi * dt.dt.dayofyear / 366).astype('float32'),
+            'month_sin': np.sin(2 * np.pi * dt.dt.month / 12).astype('float32'),
+            'month_cos': np.cos(2 * np.pi * dt.dt.month / 12).astype('float32'),
+            'kecamatan': chunk['kecamatan'],
+            **{target: chunk[target].astype('float32') for target in targets},
+        }))
+
+    df = pd.concat(chunks, ignore_index=True).drop_duplicates().reset_index(drop=True)
+    df['kecamatan'] = df['kecamatan'].astype('category')
+    return df
+
+
+def build_preprocessor():
+    # sparse_threshold=1.0 keeps the one-hot kecamatan block sparse regardless of how many kecamatan there are
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numerical_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+        ],
+        sparse_threshold=1.0)
+
+
+def to_sparse_tensor(matrix):
+    coo = matrix.tocoo()
+    indices = np.column_stack([coo.row, coo.col]).astype(np.int64)
+    sparse = tf.SparseTensor(indices, coo.data.astype(np.float32), coo.shape)
+    return tf.sparse.reorder(sparse)
+
+
+def make_dataset(X_processed, y, batch_size, shuffle, seed=42):
+    """
+    Builds a tf.data pipeline that slices the CSR matrix one batch at a time, so only the
+    current and prefetched batches ever exist as sparse tensors. Row order is reshuffled
+    every epoch; validation batches are contiguous row ranges.
+    """
+    X_processed = X_processed.tocsr()
+    y = y.to_numpy(dtype=np.float32)
+    n_rows, n_cols = X_processed.shape
+    rng = np.random.default_rng(seed)
+
+    def batches():
+        # tf.data calls this again for every epoch, so each epoch gets a new permutation
+        order = rng.permutation(n_rows) if shuffle else None
+        for start in range(0, n_rows, batch_size):
+            if order is None:
+                rows = slice(start, start + batch_size)
+            else:
+                rows = np.sort(order[start:start + batch_size])
+            yield to_sparse_tensor(X_processed[rows]), y[rows]
+
+    ds = tf.data.Dataset.from_generator(
+        batches,
+        output_signature=(
+            tf.SparseTensorSpec(shape=(None, n_cols), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, len(targets)), dtype=tf.float32),
+        ))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+def build_model(input_shape):
+    input_layer = Input(shape=(input_shape,), sparse=True, name='input')
+
+    x = Dense(128, activation='relu')(input_layer)
+    x = Dropout(0.3)(x)
+    x = Dense(64, activation='relu')(x)
+    x = Dropout(0.3)(x)
+    x = Dense(32, activation='relu')(x)
+
+    output_layer = Dense(4, name='output')(x)
+
+    model = Model(inputs=input_layer, outputs=output_layer)
+    model.compile(optimizer='adam', loss='mse', metrics=['mae'])
+    return model
+
+
+class TimeBudget(Callback):
+    """
+    Stops training at the end of the first epoch that exceeds the given wall-clock budget.
+    """
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+    def on_train_begin(self, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.perf_counter() - self._start >= self.seconds:
+            self.model.stop_training = True
+
+
+def tune_batch_size(X_train, y_train, X_test, y_test, candidates, seconds, tolerance):
+    """
+    Trains a fresh model per candidate batch size for the same wall-clock budget, so larger batches
+    are not penalized for taking fewer optimizer steps per epoch. Among the candidates whose
+    validation loss is within `tolerance` of the best, the one with the highest throughput wins.
+    """
+    results = []
+    for batch_size in candidates:
+        tf.keras.utils.set_random_seed(42)
+        model = build_model(X_train.shape[1])
+        train_ds = make_dataset(X_train, y_train, batch_size, shuffle=True)
+        val_ds = make_dataset(X_test, y_test, batch_size, shuffle=False)
+
+        timer = EpochTimer()
+        history = model.fit(train_ds, validation_data=val_ds, epochs=10_000,
+                            callbacks=[timer, TimeBudget(seconds)], verbose=0)
+        seconds_per_epoch = float(np.mean(timer.epoch_times))
+
+        val_loss = min(history.history['val_loss'])
+        print(f"[TUNE] batch_size={batch_size}: val_loss={val_loss:.4f} after {len(timer.epoch_times)} epochs, "
+              f"{seconds_per_epoch:.2f}s/epoch")
+        results.append((val_loss, seconds_per_epoch, batch_size))
+
+    best_loss = min(val_loss for val_loss, _, _ in results)
+    qualified = [r for r in results if r[0] <= best_loss * (1 + tolerance)]
+    return min(qualified, key=lambda r: r[1])[2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the seasonal weather model with a streaming tf.data pipeline.")
+    parser.add_argument('--data', default='weather.csv', help="Path to the cleaned weather csv.")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--tune-batch-sizes', default='',
+                        help="Comma separated batch sizes to probe before training, e.g. '256,512,1024'.")
+    parser.add_argument('--tune-seconds', type=float, default=60,
+                        help="Wall-clock training budget per candidate batch size.")
+    parser.add_argument('--tune-tolerance', type=float, default=0.05,
+                        help="Relative val_loss tolerance within which the fastest candidate is preferred.")
+    parser.add_argument('--chunksize', type=int, default=200_000, help="Rows read per csv chunk.")
+    parser.add_argument('--model-out', default=SEASONAL_MODEL_PATH)
+    parser.add_argument('--preprocessor-out', default=SEASONAL_PREPROCESSOR_PATH)
+    args = parser.parse_args()
+
+    tf.keras.utils.set_random_seed(42)
+
+    df = load_weather_data(args.data, args.chunksize)
+    print(f"[DATA] {len(df)} rows, {df['kecamatan'].nunique()} kecamatan")
+
+    X_train, X_test, y_train, y_test = train_test_split(df[features], df[targets], test_size=0.2, random_state=42)
+    del df
+
+    preprocessor = build_preprocessor()
+    X_train_processed = preprocessor.fit_transform(X_train)
+    X_test_processed = preprocessor.transform(X_test)
+
+    batch_size = args.batch_size
+    if args.tune_batch_sizes:
+        candidates = [int(b) for b in args.tune_batch_sizes.split(',')]
+        batch_size = tune_batch_size(X_train_processed, y_train, X_test_processed, y_test, candidates,
+                                     args.tune_seconds, args.tune_tolerance)
+        print(f"[TUNE] Selected batch_size={batch_size}")
+
+    tf.keras.utils.set_random_seed(42)
+    train_ds = make_dataset(X_train_processed, y_train, batch_size, shuffle=True)
+    val_ds = make_dataset(X_test_processed, y_test, batch_size, shuffle=False)
+
+    model = build_model(X_train_processed.shape[1])
+    model.summary()
+
+    early_stop = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    timer = EpochTimer()
+
+    model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=args.epochs,
+        callbacks=[early_stop, timer],
+        verbose=2
+    )
+
+    epoch_times = np.array(timer.epoch_times)
+    print(f"[DONE] {len(epoch_times)} epochs, mean {epoch_times.mean():.2f}s/epoch, total {epoch_times.sum():.1f}s")
+    print(f"[DONE] Peak RSS {peak_rss_mb():.1f} MB")
+
+    model.save(args.model_out)
+    with open(args.preprocessor_out, 'wb') as f:
+        pickle.dump(preprocessor, f)
+
+    print(f"Seasonal model and preprocessor saved to '{args.model_out}' and '{args.preprocessor_out}'.")
+
+
+if __name__ == '__main__':
+    main()